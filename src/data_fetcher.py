@@ -5,15 +5,26 @@ This module fetches ANBIMA's official ETTJ zero-coupon curves from their public
 Retrieves nominal (pre-fixado), IPCA-linked (real), and implicit (breakeven) curves.
 """
 
+import numpy as np
 import pandas as pd
 from datetime import date, timedelta, datetime
 from typing import List, Dict, Optional
-from urllib.request import urlopen, Request
-from urllib.error import URLError, HTTPError
+import urllib3
+from urllib3.exceptions import HTTPError
 import json
 import logging
 import os
 import base64
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,29 +33,323 @@ logger = logging.getLogger(__name__)
 ANBIMA_AUTH_URL = "https://api.anbima.com.br/oauth/access-token"
 ANBIMA_ETTJ_URL = "https://api-sandbox.anbima.com.br/feed/precos-indices/v1/titulos-publicos/curvas-juros"
 
+# Precomputed pieces of every request: the dated-URL template and the headers
+# that do not depend on the access token
+_ETTJ_URL_TMPL = ANBIMA_ETTJ_URL + '?data_referencia={}'
+_BASE_HEADERS = {
+    'User-Agent': 'AnbimaETTJ-Replication',
+    'Accept-Encoding': 'gzip, deflate',  # decoded transparently by urllib3
+}
+
+# Default upper bound on concurrent per-date requests issued by the fetcher
+MAX_FETCH_WORKERS = 8
+
+# Shared connection pool: keeps the HTTPS sockets to ANBIMA alive across
+# requests so a week of fetches does not pay one TLS handshake per call.
+_HTTP = urllib3.PoolManager(
+    num_pools=4,
+    maxsize=MAX_FETCH_WORKERS,  # one kept-alive socket per concurrent worker
+    retries=urllib3.Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=None,  # the token POST is safe to retry as well
+    ),
+)
+
+# Upper bound on ETTJ request rate; requests are spaced to stay under it
+MAX_REQUESTS_PER_SECOND = 30
+_next_request_at = 0.0
+_rate_limit_lock = threading.Lock()
+
 # Global token cache
 _access_token = None
 _token_expiry = None
+_token_lock = threading.Lock()
+_MIN_REFRESH_DELAY = 5  # seconds between background refresh attempts, at least
+
+# Response cache keyed on the requested date string. Published curves for past
+# dates never change, so they are kept for the life of the process (and on
+# disk when ANBIMA_CACHE_DIR is set); the latest curve, and any stand-in curve
+# for a date that was not yet published, is only reused briefly.
+LATEST_CACHE_TTL = 60  # seconds
+RESPONSE_CACHE_SIZE = 512
+_response_cache = OrderedDict()  # ref_date -> (fetched_at, payload, validators, final)
+_NOT_MODIFIED = object()  # sentinel for a 304 answer to a conditional request
+# Bodies the API sends when it has no curve, answered without a JSON decode
+_EMPTY_BODIES = (b'', b'{}', b'[]', b'null')
+
+# Cleared once the ETTJ endpoint is seen to ignore or reject range queries
+_range_query_supported = True
+_response_cache_lock = threading.Lock()
+
+def _throttle() -> None:
+    """Block until the next request slot under ``MAX_REQUESTS_PER_SECOND``."""
+    global _next_request_at
+    with _rate_limit_lock:
+        now = time.monotonic()
+        wait = _next_request_at - now
+        _next_request_at = max(now, _next_request_at) + 1.0 / MAX_REQUESTS_PER_SECOND
+    # Slots are reserved under the lock but slept on outside it, so workers
+    # queue up in order without serializing on the lock itself
+    if wait > 0:
+        time.sleep(wait)
+
+def _loads(data: bytes):
+    """Decode a JSON response body, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _dumps(payload) -> bytes:
+    """Encode ``payload`` as compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+def _easter(year: int) -> date:
+    """Return Easter Sunday for ``year`` (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def brazilian_holidays(year: int) -> List[date]:
+    """
+    Return the national holidays on which ANBIMA does not publish curves.
+    
+    Fixed-date holidays plus the Easter-based Carnival (Monday and Tuesday),
+    Good Friday and Corpus Christi. Black Consciousness Day (November 20)
+    is a national holiday from 2024 on.
+    """
+    easter = _easter(year)
+    holidays = [
+        date(year, 1, 1),    # Confraternização Universal
+        easter - timedelta(days=48),  # Carnaval (Monday)
+        easter - timedelta(days=47),  # Carnaval (Tuesday)
+        easter - timedelta(days=2),   # Sexta-feira Santa
+        date(year, 4, 21),   # Tiradentes
+        date(year, 5, 1),    # Dia do Trabalho
+        easter + timedelta(days=60),  # Corpus Christi
+        date(year, 9, 7),    # Independência
+        date(year, 10, 12),  # Nossa Senhora Aparecida
+        date(year, 11, 2),   # Finados
+        date(year, 11, 15),  # Proclamação da República
+        date(year, 12, 25),  # Natal
+    ]
+    if year >= 2024:
+        holidays.append(date(year, 11, 20))  # Consciência Negra
+    return sorted(holidays)
+
+def _business_days(start_date: date, end_date: date) -> List[date]:
+    """Return the Brazilian business days between ``start_date`` and ``end_date`` (inclusive)."""
+    if start_date > end_date:
+        return []
+    holidays = [
+        holiday
+        for year in range(start_date.year, end_date.year + 1)
+        for holiday in brazilian_holidays(year)
+    ]
+    return list(pd.bdate_range(start_date, end_date, freq='C', holidays=holidays).date)
+
+def _is_historical(ref_date: Optional[str]) -> bool:
+    """Return True if ``ref_date`` is a past date whose curve can no longer change."""
+    if not ref_date:
+        return False
+    try:
+        return date.fromisoformat(ref_date) < date.today()
+    except ValueError:
+        return False
+
+def _cache_get(ref_date: Optional[str], allow_stale: bool = False):
+    """Return the cached payload for ``ref_date`` if present and still fresh."""
+    with _response_cache_lock:
+        entry = _response_cache.get(ref_date)
+        if entry is None:
+            return None
+        fetched_at, payload, _, final = entry
+        if (allow_stale or final
+                or time.monotonic() - fetched_at < LATEST_CACHE_TTL):
+            _response_cache.move_to_end(ref_date)
+            return payload
+    return None
+
+def _cache_validators(ref_date: Optional[str]) -> Dict[str, str]:
+    """Return the ETag/Last-Modified validators stored for ``ref_date``."""
+    with _response_cache_lock:
+        entry = _response_cache.get(ref_date)
+        return entry[2] if entry is not None else {}
+
+def _cache_put(ref_date: Optional[str], payload, validators: Optional[Dict[str, str]] = None) -> None:
+    """Store ``payload`` in the in-process cache, evicting the oldest entries."""
+    final = _is_final(ref_date, payload)
+    with _response_cache_lock:
+        _response_cache[ref_date] = (time.monotonic(), payload, validators or {}, final)
+        _response_cache.move_to_end(ref_date)
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+def _disk_cache_path(ref_date: Optional[str]) -> Optional[str]:
+    """Return the on-disk cache file for a historical date, or None if disabled."""
+    cache_dir = os.environ.get('ANBIMA_CACHE_DIR')
+    if (not cache_dir or os.environ.get('ANBIMA_CACHE_DISABLE') == '1'
+            or not _is_historical(ref_date)):
+        return None
+    return os.path.join(cache_dir, f'{ref_date}.json')
+
+def _disk_cache_load(ref_date: Optional[str]):
+    """Load a cached response from disk, returning None on a miss."""
+    path = _disk_cache_path(ref_date)
+    if path is None:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return _loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable cache file {path}: {e}")
+        return None
+
+def _payload_date(payload) -> Optional[str]:
+    """Return the reference date a response says it carries, or None."""
+    if isinstance(payload, list):
+        payload = payload[0] if payload else None
+    return _first_present(payload, _DATE_KEYS) if isinstance(payload, dict) else None
+
+def _is_final(ref_date: Optional[str], payload) -> bool:
+    """
+    Return True if ``payload`` is the published curve of past date ``ref_date``.
+    
+    Only such responses can never change and may be cached indefinitely.
+    """
+    return _is_historical(ref_date) and _payload_date(payload) == ref_date
+
+def _disk_cache_store(ref_date: Optional[str], payload) -> None:
+    """Persist a historical response to disk; failures are logged and ignored."""
+    path = _disk_cache_path(ref_date)
+    if path is None:
+        return
+    # ANBIMA answers an unpublished date with an earlier curve; persisting
+    # that under the requested date would hide the real curve for good
+    if not _is_final(ref_date, payload):
+        logger.info(f"Not caching response for {ref_date} on disk: it carries another date")
+        return
+    # Write to a private temp file and rename, so concurrent workers and
+    # interrupted runs never leave a truncated entry behind
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(_dumps(payload))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write cache file {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def _cached_payload(ref_date: Optional[str]):
+    """Return a fresh cached payload from memory or disk, loading disk hits into memory."""
+    cached = _cache_get(ref_date)
+    if cached is None:
+        cached = _disk_cache_load(ref_date)
+        if cached is not None:
+            _cache_put(ref_date, cached)
+    return cached
+
+def clear_response_cache() -> None:
+    """Drop every in-process cached API response."""
+    with _response_cache_lock:
+        _response_cache.clear()
+
+def _cached_access_token() -> Optional[str]:
+    """Return the cached access token if it has not expired yet."""
+    if _access_token and _token_expiry:
+        if datetime.now() < _token_expiry:
+            logger.info("Using cached access token (expiry %s)", _token_expiry)
+            return _access_token
+    return None
+
+class _TokenRefresher:
+    """Daemon thread that renews the access token shortly before it expires."""
+
+    def __init__(self):
+        self._thread = None
+        self._stop = threading.Event()
+
+    def ensure_running(self):
+        """Start the refresher thread unless it is already alive."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='anbima-token-refresher', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Ask the refresher thread to exit at its next wake-up."""
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            if _token_expiry is None:
+                return
+            # _token_expiry already keeps 60 s of margin; renew 30 s before it
+            delay = (_token_expiry - datetime.now()).total_seconds() - 30
+            if self._stop.wait(max(delay, _MIN_REFRESH_DELAY)):
+                return
+            with _token_lock:
+                token = _request_access_token()
+            if not token:
+                logger.warning("Background token refresh failed; the next call will retry")
+                return
+
+_token_refresher = _TokenRefresher()
 
 def get_access_token() -> Optional[str]:
     """
     Get OAuth 2.0 access token from ANBIMA API.
     
     Uses client_id and client_secret from environment variables.
-    Caches the token until it expires.
+    Caches the token until it expires. Safe to call from several threads:
+    only one of them performs the refresh, the others reuse its token.
+    After the first successful request a background thread renews the
+    token shortly before expiry, so later calls are a plain cache read.
     
     Returns
     -------
     str or None
         Access token if successful, None otherwise.
     """
-    global _access_token, _token_expiry
-    
     # Check if we have a valid cached token
-    if _access_token and _token_expiry:
-        if datetime.now() < _token_expiry:
-            logger.info("Using cached access token (expiry %s)", _token_expiry)
-            return _access_token
+    token = _cached_access_token()
+    if token:
+        return token
+    
+    with _token_lock:
+        # Another thread may have refreshed the token while we waited
+        token = _cached_access_token()
+        if token:
+            return token
+        token = _request_access_token()
+    
+    if token:
+        _token_refresher.ensure_running()
+    return token
+
+def _request_access_token() -> Optional[str]:
+    """POST the client credentials to ANBIMA and update the token cache."""
+    global _access_token, _token_expiry
     
     # Get credentials from environment
     client_id = os.environ.get('ANBIMA_CLIENT_ID')
@@ -68,31 +373,36 @@ def get_access_token() -> Optional[str]:
         auth_string = f'{client_id}:{client_secret}'
         b64_auth = base64.b64encode(auth_string.encode()).decode()
         
-        # Create request
-        request = Request(ANBIMA_AUTH_URL, data=json_data, method='POST')
-        request.add_header('Content-Type', 'application/json')
-        request.add_header('Authorization', f'Basic {b64_auth}')
-        
         logger.info("Requesting new access token from ANBIMA")
         
         # Make request
-        with urlopen(request, timeout=30) as response:
-            if response.status in (200, 201):
-                token_data = json.loads(response.read().decode('utf-8'))
-                _access_token = token_data.get('access_token')
-                
-                # Calculate expiry (typically 3600 seconds, subtract buffer)
-                expires_in = token_data.get('expires_in', 3600)
-                _token_expiry = datetime.now() + timedelta(seconds=expires_in - 60)
-                
-                logger.info("Successfully obtained access token")
-                return _access_token
-            else:
-                logger.error(f"Failed to get access token: HTTP {response.status}")
-                return None
+        response = _HTTP.request(
+            'POST',
+            ANBIMA_AUTH_URL,
+            body=json_data,
+            headers={
+                **_BASE_HEADERS,
+                'Content-Type': 'application/json',
+                'Authorization': f'Basic {b64_auth}',
+            },
+            timeout=30.0,
+        )
+        if response.status in (200, 201):
+            token_data = _loads(response.data)
+            _access_token = token_data.get('access_token')
+            
+            # Calculate expiry (typically 3600 seconds, subtract buffer)
+            expires_in = token_data.get('expires_in', 3600)
+            _token_expiry = datetime.now() + timedelta(seconds=expires_in - 60)
+            
+            logger.info("Successfully obtained access token")
+            return _access_token
+        else:
+            logger.error(f"Failed to get access token: HTTP {response.status}")
+            return None
                 
     except HTTPError as e:
-        logger.error(f"HTTP error getting access token: {e.code} - {e.reason}")
+        logger.error(f"HTTP error getting access token: {e}")
         return None
     except Exception as e:
         logger.error(f"Error getting access token: {e}")
@@ -103,7 +413,16 @@ def fetch_anbima_ettj_api(ref_date: Optional[str] = None) -> Optional[dict]:
     Helper function to fetch ETTJ data from ANBIMA's public API.
     
     Calls the ANBIMA public ETTJ endpoint and returns the parsed JSON response.
-    Uses only standard library (urllib.request + json).
+    Requests go through the module-level urllib3 pool, so the HTTPS
+    connection is reused across calls.
+    
+    Responses are cached by ``ref_date``: past dates whose published curve
+    has been received are served from memory (or from ``ANBIMA_CACHE_DIR``
+    when set) without touching the network,
+    while the latest curve is reused for ``LATEST_CACHE_TTL`` seconds and then
+    revalidated with ``If-None-Match``/``If-Modified-Since``, so an unchanged
+    curve costs a bodiless 304. If the request fails, a stale cached copy is
+    returned when one exists.
     
     Parameters
     ----------
@@ -118,62 +437,309 @@ def fetch_anbima_ettj_api(ref_date: Optional[str] = None) -> Optional[dict]:
         
     Raises
     ------
-    URLError, HTTPError
-        Network-related errors are logged and re-raised.
+    urllib3.exceptions.HTTPError
+        Network-related errors (after retries) are logged and re-raised.
+    """
+    cached = _cached_payload(ref_date)
+    if cached is not None:
+        logger.info(f"Using cached ETTJ data for {ref_date or 'latest'}")
+        return cached
+    
+    # An expired entry can still be revalidated with a conditional request
+    validators = _cache_validators(ref_date)
+    try:
+        json_data, new_validators = _request_ettj(ref_date, validators)
+    except HTTPError:
+        stale = _cache_get(ref_date, allow_stale=True)
+        if stale is None:
+            raise
+        logger.warning(f"Serving stale cached ETTJ data for {ref_date or 'latest'}")
+        return stale
+    
+    if json_data is _NOT_MODIFIED:
+        logger.info(f"ETTJ data for {ref_date or 'latest'} not modified; reusing cached copy")
+        json_data = _cache_get(ref_date, allow_stale=True)
+        _cache_put(ref_date, json_data, new_validators or validators)
+        return json_data
+    
+    if json_data:
+        _cache_put(ref_date, json_data, new_validators)
+        _disk_cache_store(ref_date, json_data)
+    return json_data
+
+
+def _ettj_headers(access_token: str) -> Dict[str, str]:
+    """Return the authenticated headers for a GET on the ETTJ endpoint."""
+    return {
+        **_BASE_HEADERS,
+        'Authorization': f'Bearer {access_token}',
+        'client_id': os.environ.get('ANBIMA_CLIENT_ID'),
+        'access_token': access_token,
+    }
+
+def _request_ettj(ref_date: Optional[str], validators: Optional[Dict[str, str]] = None):
+    """
+    Perform the authenticated ETTJ request, bypassing the response cache.
+    
+    ``validators`` holds the ``etag``/``last_modified`` of a cached copy; when
+    given, the request is made conditional. Returns ``(payload, validators)``
+    where payload is ``_NOT_MODIFIED`` if the server answered 304.
     """
     try:
         # Get access token first
         access_token = get_access_token()
         if not access_token:
             logger.error("Cannot fetch ETTJ data: failed to obtain access token")
-            return None
+            return None, {}
         
         # Build URL with optional date parameter
-        url = ANBIMA_ETTJ_URL
-        if ref_date:
-            url = f"{url}?data_referencia={ref_date}"
+        url = _ETTJ_URL_TMPL.format(ref_date) if ref_date else ANBIMA_ETTJ_URL
         
         logger.info(f"Fetching ETTJ data from ANBIMA API: {url}")
         
-        # Create request with authentication headers
-        request = Request(url)
-        request.add_header('User-Agent', 'Python-urllib/AnbimaETTJ-Replication')
-        request.add_header('Authorization', f'Bearer {access_token}')
-        request.add_header('client_id', os.environ.get('ANBIMA_CLIENT_ID'))
-        request.add_header('access_token', access_token)
-        
-        # Perform HTTP GET request
-        with urlopen(request, timeout=30) as response:
-            if response.status in (200, 201):
-                data = response.read()
-                # Parse JSON response
-                json_data = json.loads(data.decode('utf-8'))
-                logger.info(f"Successfully fetched ETTJ data from ANBIMA API")
-                return json_data
-            else:
-                logger.warning(f"ANBIMA API returned status {response.status}")
-                return None
+        headers = _ettj_headers(access_token)
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        
+        # Perform HTTP GET request with authentication headers
+        _throttle()
+        response = _HTTP.request('GET', url, headers=headers, timeout=30.0)
+        new_validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        new_validators = {k: v for k, v in new_validators.items() if v}
+        
+        if response.status == 304 and validators:
+            return _NOT_MODIFIED, new_validators
+        if response.status in (200, 201):
+            if response.data.strip() in _EMPTY_BODIES:
+                # No curve published for this date; nothing worth decoding
+                logger.warning(f"ANBIMA API returned an empty body for {ref_date or 'latest'}")
+                return None, {}
+            # Parse JSON response
+            json_data = _loads(response.data)
+            logger.info(f"Successfully fetched ETTJ data from ANBIMA API")
+            return json_data, new_validators
+        else:
+            logger.warning(f"ANBIMA API returned status {response.status}")
+            return None, {}
                 
     except HTTPError as e:
-        logger.error(f"HTTP error fetching ETTJ data: {e.code} - {e.reason}")
-        raise
-    except URLError as e:
-        logger.error(f"URL error fetching ETTJ data: {e.reason}")
+        logger.error(f"HTTP error fetching ETTJ data: {e}")
         raise
     except json.JSONDecodeError as e:
         logger.error(f"JSON decode error: {e}")
-        return None
+        return None, {}
     except Exception as e:
         logger.error(f"Unexpected error fetching ETTJ data: {e}")
         raise
 
 
+def fetch_anbima_ettj_api_range(start_date: str, end_date: str) -> Optional[Dict[str, dict]]:
+    """
+    Try to fetch every reference date in a range with a single request.
+    
+    Sends ``data_inicio``/``data_fim`` to the ETTJ endpoint. ANBIMA does not
+    document range queries, so the answer is only trusted when it carries
+    curves for more than one ``data_referencia``. Otherwise, or if the
+    request fails in any way, range queries are disabled for the rest of the
+    process and callers fall back to one request per date, rather than
+    paying for retries and timeouts again on every later call.
+    
+    Parameters
+    ----------
+    start_date, end_date : str
+        Range bounds in YYYY-MM-DD format (inclusive).
+    
+    Returns
+    -------
+    dict or None
+        Per-date payloads keyed by ``data_referencia``, each in the same shape
+        as a single-date response, or None if the range could not be fetched.
+    """
+    global _range_query_supported
+    if not _range_query_supported:
+        return None
+    
+    access_token = get_access_token()
+    if not access_token:
+        return None
+    
+    url = f"{ANBIMA_ETTJ_URL}?data_inicio={start_date}&data_fim={end_date}"
+    logger.info(f"Fetching ETTJ date range from ANBIMA API: {url}")
+    try:
+        _throttle()
+        response = _HTTP.request('GET', url, headers=_ettj_headers(access_token), timeout=30.0)
+        if response.status not in (200, 201):
+            _range_query_supported = False
+            logger.info(
+                f"ANBIMA API returned status {response.status} for the date range; "
+                "fetching per date from now on"
+            )
+            return None
+        json_data = _loads(response.data)
+    except (HTTPError, ValueError) as e:
+        _range_query_supported = False
+        logger.warning(f"Date-range fetch failed, fetching per date from now on: {e}")
+        return None
+    
+    # Group the curves by the date they actually refer to
+    items = json_data if isinstance(json_data, list) else [json_data]
+    by_date = {}
+    for item in items:
+        if isinstance(item, dict):
+            ref_date = _first_present(item, _DATE_KEYS)
+            if ref_date:
+                by_date[ref_date] = item
+    
+    if len(by_date) < 2:
+        # The endpoint ignored the range and answered with a single curve
+        _range_query_supported = False
+        logger.info("ANBIMA endpoint does not support date-range queries; fetching per date")
+        return None
+    return by_date
+
+def _prefetch_date_range(dates: List[date]) -> None:
+    """Warm the response cache for ``dates`` with a single range request."""
+    # Dates already in memory or on disk need no request at all; only the
+    # span between the first and last missing date is asked for
+    wanted = [d.isoformat() for d in dates if _cached_payload(d.isoformat()) is None]
+    if len(wanted) < 2:
+        # A single missing date is no cheaper as a range, and a one-date
+        # answer would wrongly mark range queries as unsupported
+        return
+    by_date = fetch_anbima_ettj_api_range(min(wanted), max(wanted))
+    wanted = set(wanted)
+    for ref_date, payload in (by_date or {}).items():
+        if ref_date in wanted:
+            _cache_put(ref_date, payload)
+            _disk_cache_store(ref_date, payload)
+
+
+# Field-name aliases seen across ANBIMA response formats, in lookup order
+_DATE_KEYS = ('data_referencia', 'dataReferencia')
+_DU_KEYS = ('vertice_du', 'du', 'prazo_du')
+_NOMINAL_KEYS = ('taxa_prefixadas', 'taxa_nominal', 'taxa_pre')
+_REAL_KEYS = ('taxa_ipca', 'taxa_real')
+_BREAKEVEN_KEYS = ('taxa_implicita', 'taxa_breakeven')
+
+def _resolve_key(sample: dict, aliases: tuple) -> Optional[str]:
+    """Return the first of ``aliases`` present in ``sample``, or None."""
+    for key in aliases:
+        if key in sample:
+            return key
+    return None
+
+def _first_present(item: dict, aliases: tuple):
+    """
+    Return the value of the first alias in ``item`` that is not None.
+    
+    Unlike an ``or`` chain this keeps legitimate zero rates (``0.0`` is falsy).
+    """
+    for key in aliases:
+        value = item.get(key)
+        if value is not None:
+            return value
+    return None
+
+_FIELD_ALIASES = (_DU_KEYS, _NOMINAL_KEYS, _REAL_KEYS, _BREAKEVEN_KEYS)
+
+def _vertex_getter(sample: dict):
+    """
+    Return an ``itemgetter`` for the field names ``sample`` uses.
+    
+    Returns None unless every field resolved, so a vertex is never read with
+    a getter that would silently drop a field it does not name.
+    """
+    keys = tuple(_resolve_key(sample, aliases) for aliases in _FIELD_ALIASES)
+    return itemgetter(*keys) if all(keys) else None
+
+def _vertex_fields(item: dict, get_fields) -> tuple:
+    """
+    Return ``(du, nominal, real, breakeven)`` for one vertex.
+    
+    Reads the fields with ``get_fields`` when given; any field it cannot
+    provide (key missing, or null under the resolved name) is looked up by
+    alias with ``_first_present``.
+    """
+    if get_fields is not None:
+        try:
+            fields = get_fields(item)
+        except KeyError:
+            # This vertex deviates from the first one's schema
+            pass
+        else:
+            if None not in fields:
+                return fields
+            return tuple(
+                value if value is not None else _first_present(item, aliases)
+                for value, aliases in zip(fields, _FIELD_ALIASES)
+            )
+    return tuple(_first_present(item, aliases) for aliases in _FIELD_ALIASES)
+
+def vertices_to_frame(vertices: List[Dict]) -> pd.DataFrame:
+    """
+    Build a typed DataFrame from vertex dictionaries.
+    
+    The frame is built from the finished list of dicts, so it gives
+    downstream code typed columns but does not reduce peak memory while
+    parsing.
+    
+    Values that are not numeric (e.g. ``'11,5'``) become NaN instead of
+    failing the whole frame; vertices whose ``du`` is not numeric are
+    dropped.
+    
+    Parameters
+    ----------
+    vertices : list of dict
+        Vertex dictionaries as returned by ``AnbimaETTJFetcher.fetch_ettj_for_date``.
+    
+    Returns
+    -------
+    pd.DataFrame
+        Columns ``date``, ``du`` (int32) and ``nominal``, ``real``,
+        ``breakeven`` (float64, NaN where the API gave no usable rate).
+    """
+    frame = pd.DataFrame({
+        'date': [v['date'] for v in vertices],
+        'du': pd.to_numeric([v['du'] for v in vertices], errors='coerce'),
+        'nominal': pd.to_numeric([v['nominal'] for v in vertices], errors='coerce'),
+        'real': pd.to_numeric([v['real'] for v in vertices], errors='coerce'),
+        'breakeven': pd.to_numeric([v['breakeven'] for v in vertices], errors='coerce'),
+    })
+    valid_du = frame['du'].notna()
+    if not valid_du.all():
+        logger.warning(f"Dropping {(~valid_du).sum()} vertices with a non-numeric du")
+        frame = frame[valid_du].reset_index(drop=True)
+    return frame.astype({
+        'du': 'int32', 'nominal': 'float64', 'real': 'float64', 'breakeven': 'float64'
+    })
+
+
 class AnbimaETTJFetcher:
     """Fetches ANBIMA ETTJ zero-coupon curves."""
 
-    def __init__(self):
-        """Initialize the ANBIMA ETTJ fetcher."""
+    def __init__(self, max_workers: int = MAX_FETCH_WORKERS):
+        """
+        Initialize the ANBIMA ETTJ fetcher.
+        
+        Parameters
+        ----------
+        max_workers : int
+            Maximum number of dates fetched concurrently by the range methods.
+            Values above ``MAX_FETCH_WORKERS`` open sockets the shared pool
+            will not keep alive.
+        """
         self.logger = logger
+        self.max_workers = max(1, max_workers)
+        # Parsed vertices for past dates, which cannot change once published;
+        # bounded like the response cache and shared by the worker threads
+        self._date_cache: "OrderedDict[date, List[Dict]]" = OrderedDict()
+        self._date_cache_lock = threading.Lock()
 
     def fetch_ettj_for_date(self, ref_date: date) -> List[Dict]:
         """
@@ -205,8 +771,14 @@ class AnbimaETTJFetcher:
         >>> data = fetcher.fetch_ettj_for_date(date(2024, 11, 14))
         >>> # Returns: [{'date': date(2024,11,14), 'du': 21, 'nominal': 11.5, 'real': 6.2, 'breakeven': 5.0}, ...]
         """
-        # Convert date to string format expected by API
-        date_str = ref_date.strftime('%Y-%m-%d')
+        # Convert date to the YYYY-MM-DD format expected by the API
+        date_str = ref_date.isoformat()
+        
+        with self._date_cache_lock:
+            cached = self._date_cache.get(ref_date)
+            if cached is not None:
+                self._date_cache.move_to_end(ref_date)
+                return [dict(v) for v in cached]
         
         try:
             # Call the helper function to fetch from API
@@ -217,25 +789,89 @@ class AnbimaETTJFetcher:
                 self.logger.warning(f"No ETTJ data returned from API for {date_str}")
                 return []
             
-            # Parse the API response and extract curve data
-            result = []
-            
-            # The actual API structure may vary, so we need to handle different formats
-            # Based on typical ANBIMA API structure, we expect something like:
-            # { "data_referencia": "YYYY-MM-DD", "curvas": [...] }
-            # or { "curvas_juros": [...] }
+            result = self._parse_ettj(api_response, ref_date)
+            # Only the published curve of a past date is final; a stand-in
+            # for a date not yet published must be fetched again later
+            if (result and _is_historical(date_str)
+                    and all(v['date'] == ref_date for v in result)):
+                with self._date_cache_lock:
+                    self._date_cache[ref_date] = result
+                    self._date_cache.move_to_end(ref_date)
+                    while len(self._date_cache) > RESPONSE_CACHE_SIZE:
+                        self._date_cache.popitem(last=False)
+                return [dict(v) for v in result]
+            return result
             
-            # Extract the actual reference date from API response
-            actual_date = ref_date  # Default to requested date
-            curves_data = None
+        except HTTPError as e:
+            # Network errors - log and return empty list
+            self.logger.error(f"Network error fetching ETTJ for {date_str}: {e}")
+            return []
+        except Exception as e:
+            # Unexpected errors - log and return empty list
+            self.logger.error(f"Unexpected error fetching ETTJ for {date_str}: {e}")
+            return []
+    
+    def _parse_ettj(self, api_response, ref_date: date) -> List[Dict]:
+        """
+        Parse an already-fetched ETTJ API response into vertex dictionaries.
+        
+        Parameters
+        ----------
+        api_response : dict or list
+            Parsed JSON returned by ``fetch_anbima_ettj_api``.
+        ref_date : date
+            Requested reference date, used when the response carries no date.
+        
+        Returns
+        -------
+        list of dict
+            Vertex dictionaries as described in ``fetch_ettj_for_date``.
+        """
+        date_str = ref_date.isoformat()
+        
+        # Parse the API response and extract curve data
+        result = []
+        
+        # The actual API structure may vary, so we need to handle different formats
+        # Based on typical ANBIMA API structure, we expect something like:
+        # { "data_referencia": "YYYY-MM-DD", "curvas": [...] }
+        # or { "curvas_juros": [...] }
+        
+        # Extract the actual reference date from API response
+        actual_date = ref_date  # Default to requested date
+        curves_data = None
+        
+        if isinstance(api_response, dict):
+            # Try to extract actual date from response
+            date_from_response = _first_present(api_response, _DATE_KEYS)
+            if date_from_response:
+                try:
+                    # Parse the date string to a date object
+                    actual_date = date.fromisoformat(date_from_response)
+                    if actual_date != ref_date:
+                        self.logger.warning(
+                            f"API returned data for {actual_date} instead of requested {ref_date}"
+                        )
+                except (ValueError, TypeError) as e:
+                    self.logger.warning(f"Could not parse date from API response: {e}")
             
-            if isinstance(api_response, dict):
-                # Try to extract actual date from response
-                date_from_response = api_response.get('data_referencia') or api_response.get('dataReferencia')
+            # Try different possible keys for curves data
+            curves_data = (
+                api_response.get('ettj') or
+                api_response.get('curvas') or 
+                api_response.get('curvas_juros') or
+                api_response.get('data') or
+                []
+            )
+        elif isinstance(api_response, list):
+            # API returns list with single dict containing 'ettj' key
+            if len(api_response) > 0 and isinstance(api_response[0], dict):
+                # Try to extract date from first item
+                first_item = api_response[0]
+                date_from_response = _first_present(first_item, _DATE_KEYS)
                 if date_from_response:
                     try:
-                        # Parse the date string to a date object
-                        actual_date = datetime.strptime(date_from_response, '%Y-%m-%d').date()
+                        actual_date = date.fromisoformat(date_from_response)
                         if actual_date != ref_date:
                             self.logger.warning(
                                 f"API returned data for {actual_date} instead of requested {ref_date}"
@@ -243,85 +879,57 @@ class AnbimaETTJFetcher:
                     except (ValueError, TypeError) as e:
                         self.logger.warning(f"Could not parse date from API response: {e}")
                 
-                # Try different possible keys for curves data
-                curves_data = (
-                    api_response.get('ettj') or
-                    api_response.get('curvas') or 
-                    api_response.get('curvas_juros') or
-                    api_response.get('data') or
-                    []
-                )
-            elif isinstance(api_response, list):
-                # API returns list with single dict containing 'ettj' key
-                if len(api_response) > 0 and isinstance(api_response[0], dict):
-                    # Try to extract date from first item
-                    first_item = api_response[0]
-                    date_from_response = first_item.get('data_referencia') or first_item.get('dataReferencia')
-                    if date_from_response:
-                        try:
-                            actual_date = datetime.strptime(date_from_response, '%Y-%m-%d').date()
-                            if actual_date != ref_date:
-                                self.logger.warning(
-                                    f"API returned data for {actual_date} instead of requested {ref_date}"
-                                )
-                        except (ValueError, TypeError) as e:
-                            self.logger.warning(f"Could not parse date from API response: {e}")
-                    
-                    curves_data = first_item.get('ettj', api_response)
-                else:
-                    curves_data = api_response
-            
-            if not curves_data:
-                self.logger.warning(f"No curve data found in API response for {date_str}")
-                return []
-            
-            # Process each vertex in the curves
-            for item in curves_data:
-                try:
-                    # Extract vertex data
-                    # Typical fields: vertice_du, taxa_prefixadas, taxa_ipca, taxa_implicita
-                    vertex_entry = {
-                        'date': actual_date,  # Use actual date from API response
-                        'du': item.get('vertice_du') or item.get('du') or item.get('prazo_du'),
-                        'nominal': item.get('taxa_prefixadas') or item.get('taxa_nominal') or item.get('taxa_pre'),
-                        'real': item.get('taxa_ipca') or item.get('taxa_real'),
-                        'breakeven': item.get('taxa_implicita') or item.get('taxa_breakeven')
-                    }
-                    
-                    # Only add if we have at least DU and one rate
-                    if vertex_entry['du'] is not None and any([
-                        vertex_entry['nominal'] is not None,
-                        vertex_entry['real'] is not None,
-                        vertex_entry['breakeven'] is not None
-                    ]):
-                        result.append(vertex_entry)
-                    
-                except (KeyError, TypeError) as e:
-                    self.logger.warning(f"Error parsing vertex data: {e}")
-                    continue
-            
-            if result:
-                self.logger.info(f"Successfully parsed {len(result)} ETTJ vertices for {date_str}")
+                curves_data = first_item.get('ettj', api_response)
             else:
-                self.logger.warning(f"No valid vertices found in API response for {date_str}")
+                curves_data = api_response
+        
+        if not curves_data:
+            self.logger.warning(f"No curve data found in API response for {date_str}")
+            return []
+        
+        # ANBIMA uses a single naming scheme per response, so resolve the
+        # field names once from the first vertex instead of on every row
+        sample = curves_data[0] if isinstance(curves_data, list) and isinstance(curves_data[0], dict) else {}
+        get_fields = _vertex_getter(sample)
+        
+        # Process each vertex in the curves
+        for item in curves_data:
+            try:
+                if not isinstance(item, dict):
+                    raise TypeError(f"vertex is not an object: {item!r}")
+                # Typical fields: vertice_du, taxa_prefixadas, taxa_ipca, taxa_implicita
+                du, nominal, real, breakeven = _vertex_fields(item, get_fields)
                 
-            return result
+                # Only add if we have at least DU and one rate
+                if du is not None and (
+                    nominal is not None or real is not None or breakeven is not None
+                ):
+                    result.append({
+                        'date': actual_date,  # Use actual date from API response
+                        'du': du,
+                        'nominal': nominal,
+                        'real': real,
+                        'breakeven': breakeven
+                    })
+                
+            except (KeyError, TypeError) as e:
+                self.logger.warning(f"Error parsing vertex data: {e}")
+                continue
+        
+        if result:
+            self.logger.info(f"Successfully parsed {len(result)} ETTJ vertices for {date_str}")
+        else:
+            self.logger.warning(f"No valid vertices found in API response for {date_str}")
             
-        except (URLError, HTTPError) as e:
-            # Network errors - log and return empty list
-            self.logger.error(f"Network error fetching ETTJ for {date_str}: {e}")
-            return []
-        except Exception as e:
-            # Unexpected errors - log and return empty list
-            self.logger.error(f"Unexpected error fetching ETTJ for {date_str}: {e}")
-            return []
+        return result
     
     def fetch_week_data(self, start_date: date, end_date: date) -> List[Dict]:
         """
         Fetch ETTJ data for a range of dates (typically a week).
         
         Only returns data for dates where ANBIMA has published data.
-        Skips weekends and Brazilian holidays automatically.
+        Skips weekends and Brazilian holidays automatically. The per-date
+        requests are issued concurrently over the shared connection pool.
         
         Parameters
         ----------
@@ -335,55 +943,52 @@ class AnbimaETTJFetcher:
         list of dict
             Combined list of all vertex data for all valid dates in the range.
         """
-        all_data = []
-        current_date = start_date
-        
-        while current_date <= end_date:
-            # Skip weekends
-            if current_date.weekday() < 5:  # Monday = 0, Friday = 4
-                daily_data = self.fetch_ettj_for_date(current_date)
-                if daily_data:  # Only add if we got valid data
-                    all_data.extend(daily_data)
-            
-            current_date += timedelta(days=1)
+        return self._fetch_dates_concurrently(
+            self.fetch_ettj_for_date, _business_days(start_date, end_date)
+        )
+
+    def fetch_week_frame(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """
+        Fetch ETTJ data for a range of dates as a columnar DataFrame.
         
-        return all_data
+        Same data as ``fetch_week_data``, laid out as one typed column per
+        field (see ``vertices_to_frame``) instead of one dict per vertex.
+        """
+        return vertices_to_frame(self.fetch_week_data(start_date, end_date))
 
     def fetch_parameters_for_date(self, ref_date: date) -> List[Dict]:
         """Fetch NSS curve parameters (Nelson-Siegel-Svensson) for a specific date."""
-        date_str = ref_date.strftime('%Y-%m-%d')
+        date_str = ref_date.isoformat()
         try:
             api_response = fetch_anbima_ettj_api(date_str)
             if not api_response:
                 self.logger.warning(f"No parameter data returned from API for {date_str}")
                 return []
             
-            # Extract the actual reference date from API response
-            actual_date = ref_date  # Default to requested date
-            parametros_list = []
-            
-            if isinstance(api_response, list) and api_response:
-                first = api_response[0]
-                if isinstance(first, dict):
-                    # Try to extract date from response
-                    date_from_response = first.get('data_referencia') or first.get('dataReferencia')
-                    if date_from_response:
-                        try:
-                            actual_date = datetime.strptime(date_from_response, '%Y-%m-%d').date()
-                            if actual_date != ref_date:
-                                self.logger.warning(
-                                    f"API returned parameters for {actual_date} instead of requested {ref_date}"
-                                )
-                        except (ValueError, TypeError) as e:
-                            self.logger.warning(f"Could not parse date from API response: {e}")
-                    
-                    parametros_list = first.get('parametros', []) or []
-            elif isinstance(api_response, dict):
+            return self._parse_parameters(api_response, ref_date)
+        except HTTPError as e:
+            self.logger.error(f"Network error fetching parameters for {date_str}: {e}")
+            return []
+        except Exception as e:
+            self.logger.error(f"Unexpected error fetching parameters for {date_str}: {e}")
+            return []
+
+    def _parse_parameters(self, api_response, ref_date: date) -> List[Dict]:
+        """Parse an already-fetched API response into NSS parameter dictionaries."""
+        date_str = ref_date.isoformat()
+        
+        # Extract the actual reference date from API response
+        actual_date = ref_date  # Default to requested date
+        parametros_list = []
+        
+        if isinstance(api_response, list) and api_response:
+            first = api_response[0]
+            if isinstance(first, dict):
                 # Try to extract date from response
-                date_from_response = api_response.get('data_referencia') or api_response.get('dataReferencia')
+                date_from_response = _first_present(first, _DATE_KEYS)
                 if date_from_response:
                     try:
-                        actual_date = datetime.strptime(date_from_response, '%Y-%m-%d').date()
+                        actual_date = date.fromisoformat(date_from_response)
                         if actual_date != ref_date:
                             self.logger.warning(
                                 f"API returned parameters for {actual_date} instead of requested {ref_date}"
@@ -391,48 +996,72 @@ class AnbimaETTJFetcher:
                     except (ValueError, TypeError) as e:
                         self.logger.warning(f"Could not parse date from API response: {e}")
                 
-                parametros_list = api_response.get('parametros', []) or []
-            
-            if not parametros_list:
-                self.logger.warning(f"No NSS parameters found in API response for {date_str}")
-                return []
-            
-            result=[]
-            for p in parametros_list:
+                parametros_list = first.get('parametros', []) or []
+        elif isinstance(api_response, dict):
+            # Try to extract date from response
+            date_from_response = _first_present(api_response, _DATE_KEYS)
+            if date_from_response:
                 try:
-                    entry={
-                        'date': actual_date,  # Use actual date from API response
-                        'grupo_indexador': p.get('grupo_indexador'),
-                        'b1': p.get('b1'),
-                        'b2': p.get('b2'),
-                        'b3': p.get('b3'),
-                        'b4': p.get('b4'),
-                        'l1': p.get('l1'),
-                        'l2': p.get('l2')
-                    }
-                    if entry['grupo_indexador'] and entry['b1'] is not None:
-                        result.append(entry)
-                except Exception as e:
-                    self.logger.warning(f"Error parsing parameter block: {e}")
-            if result:
-                self.logger.info(f"Parsed {len(result)} NSS parameter sets for {date_str}")
-            return result
-        except (URLError, HTTPError) as e:
-            self.logger.error(f"Network error fetching parameters for {date_str}: {e}")
-            return []
-        except Exception as e:
-            self.logger.error(f"Unexpected error fetching parameters for {date_str}: {e}")
+                    actual_date = date.fromisoformat(date_from_response)
+                    if actual_date != ref_date:
+                        self.logger.warning(
+                            f"API returned parameters for {actual_date} instead of requested {ref_date}"
+                        )
+                except (ValueError, TypeError) as e:
+                    self.logger.warning(f"Could not parse date from API response: {e}")
+            
+            parametros_list = api_response.get('parametros', []) or []
+        
+        if not parametros_list:
+            self.logger.warning(f"No NSS parameters found in API response for {date_str}")
             return []
+        
+        result=[]
+        for p in parametros_list:
+            try:
+                entry={
+                    'date': actual_date,  # Use actual date from API response
+                    'grupo_indexador': p.get('grupo_indexador'),
+                    'b1': p.get('b1'),
+                    'b2': p.get('b2'),
+                    'b3': p.get('b3'),
+                    'b4': p.get('b4'),
+                    'l1': p.get('l1'),
+                    'l2': p.get('l2')
+                }
+                if entry['grupo_indexador'] and entry['b1'] is not None:
+                    result.append(entry)
+            except Exception as e:
+                self.logger.warning(f"Error parsing parameter block: {e}")
+        if result:
+            self.logger.info(f"Parsed {len(result)} NSS parameter sets for {date_str}")
+        return result
 
     def fetch_parameters_week(self, start_date: date, end_date: date) -> List[Dict]:
         """Fetch NSS parameters for each business day in the given date range."""
-        all_params=[]
-        current_date=start_date
-        while current_date <= end_date:
-            if current_date.weekday() < 5:
-                daily=self.fetch_parameters_for_date(current_date)
-                if daily:
-                    all_params.extend(daily)
-            current_date += timedelta(days=1)
-        return all_params
+        return self._fetch_dates_concurrently(
+            self.fetch_parameters_for_date, _business_days(start_date, end_date)
+        )
 
+    def _fetch_dates_concurrently(self, fetch_fn, dates: List[date]) -> List[Dict]:
+        """
+        Run ``fetch_fn`` for every date on a thread pool and flatten the results.
+        
+        The work is network-bound and independent per date, so overlapping the
+        requests turns N serial round-trips into roughly one. Results keep the
+        order of ``dates``.
+        """
+        if not dates:
+            return []
+        
+        # One range request can replace the per-date round-trips; dates it
+        # covers are then answered from the response cache
+        if len(dates) > 1:
+            _prefetch_date_range(dates)
+        
+        all_data = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(dates))) as executor:
+            for daily_data in executor.map(fetch_fn, dates):
+                if daily_data:  # Only add if we got valid data
+                    all_data.extend(daily_data)
+        return all_data
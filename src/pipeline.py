@@ -19,6 +19,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Explicit column types for re-reading the output CSVs: skips pandas' type
+# inference and keeps dates as the ISO strings the dedup keys compare on
+_CURVE_DTYPES = {'date': str, 'du': 'int64', 'rate': 'float64'}
+_PARAMETER_DTYPES = {
+    'date': str, 'grupo_indexador': str,
+    'b1': 'float64', 'b2': 'float64', 'b3': 'float64', 'b4': 'float64',
+    'l1': 'float64', 'l2': 'float64',
+}
+
+
+def _iso_dates(dates: pd.Series) -> pd.Series:
+    """Format a column of dates as YYYY-MM-DD strings for CSV storage."""
+    return pd.to_datetime(dates, cache=True).dt.strftime('%Y-%m-%d')
+
+
+def _dedupe_sorted(df: pd.DataFrame, keys: list) -> pd.DataFrame:
+    """
+    Sort ``df`` by ``keys`` and keep the last row of each key.
+    
+    Dedup and sort share one stable index sort instead of a hash-based
+    drop_duplicates followed by a separate sort_values. Stability keeps
+    rows in concat order within a key, so 'last' is the newest row.
+    """
+    df = df.set_index(keys).sort_index(kind='mergesort')
+    return df[~df.index.duplicated(keep='last')].reset_index()
+
+
+def _last_csv_date(filepath: str):
+    """
+    Return the date of the last row of a date-sorted output CSV.
+    
+    Only the tail of the file is read, so the check costs the same no matter
+    how much history the file holds. Returns None when the file has no data
+    rows or does not end with a newline (it cannot be appended to as is).
+    """
+    with open(filepath, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        tail = f.read()
+    lines = [line for line in tail.splitlines() if line.strip()]
+    if not lines or not tail.endswith(b'\n'):
+        return None
+    last_date = lines[-1].split(b',', 1)[0].decode('utf-8')
+    return None if last_date == 'date' else last_date
+
 
 class ETTJPipeline:
     """Main pipeline for ANBIMA ETTJ data fetching and storage."""
@@ -74,17 +119,14 @@ class ETTJPipeline:
         
         self.logger.info(f"Running ETTJ pipeline for {start_date} to {end_date}")
         
-        # Fetch data for the date range
-        data = self.fetcher.fetch_week_data(start_date, end_date)
+        # Fetch data for the date range as a columnar DataFrame
+        df = self.fetcher.fetch_week_frame(start_date, end_date)
         
-        if not data:
+        if df.empty:
             self.logger.warning("No data fetched from ANBIMA API")
             return
         
-        self.logger.info(f"Fetched {len(data)} data points")
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(data)
+        self.logger.info(f"Fetched {len(df)} data points")
         
         # Save to CSV
         self._save_to_csv(df)
@@ -118,35 +160,45 @@ class ETTJPipeline:
             'breakeven': 'ettj_breakeven.csv'
         }
         
+        # Format dates once, vectorized, rather than str() per row per file
+        new_data = new_data.assign(date=_iso_dates(new_data['date']))
+        
         for rate_type, filename in files.items():
             filepath = os.path.join(self.output_dir, filename)
             
-            # Filter data for this rate type (only rows where this rate is not None)
-            rate_data = new_data[new_data[rate_type].notna()].copy()
+            # Select this rate's rows and columns in one step (only rows where
+            # this rate is not None); no defensive copies, nothing is mutated
+            output_df = new_data.loc[
+                new_data[rate_type].notna(), ['date', 'du', rate_type]
+            ].rename(columns={rate_type: 'rate'})
             
-            if rate_data.empty:
+            if output_df.empty:
                 self.logger.info(f"No {rate_type} data to save")
                 continue
             
-            # Prepare data for saving
-            output_df = rate_data[['date', 'du', rate_type]].copy()
-            output_df.columns = ['date', 'du', 'rate']
-            
-            # Convert date to string for CSV storage
-            output_df['date'] = output_df['date'].astype(str)
-            
             # Append to existing file or create new one
-            if os.path.exists(filepath):
-                existing_df = pd.read_csv(filepath)
+            # Opening the file doubles as the existence check (one syscall)
+            try:
+                last_date = _last_csv_date(filepath)
+                file_exists = True
+            except FileNotFoundError:
+                last_date, file_exists = None, False
+            
+            if last_date is not None and output_df['date'].min() > last_date:
+                # Normal weekly run: every new row is later than the file's
+                # history, so append instead of rewriting the whole file
+                output_df = _dedupe_sorted(output_df, ['date', 'du'])
+                output_df.to_csv(filepath, mode='a', header=False, index=False)
+                self.logger.info(f"Appended {len(output_df)} new records to {filename}")
+            elif file_exists:
+                existing_df = pd.read_csv(filepath, dtype=_CURVE_DTYPES)
                 combined_df = pd.concat([existing_df, output_df], ignore_index=True)
-                # Remove duplicates (same date and du)
-                combined_df = combined_df.drop_duplicates(subset=['date', 'du'], keep='last')
-                # Sort by date and du
-                combined_df = combined_df.sort_values(['date', 'du']).reset_index(drop=True)
+                # Sort by date and du, keeping the newest row per (date, du)
+                combined_df = _dedupe_sorted(combined_df, ['date', 'du'])
                 combined_df.to_csv(filepath, index=False)
                 self.logger.info(f"Updated {filename} with {len(output_df)} new records")
             else:
-                output_df = output_df.sort_values(['date', 'du']).reset_index(drop=True)
+                output_df = _dedupe_sorted(output_df, ['date', 'du'])
                 output_df.to_csv(filepath, index=False)
                 self.logger.info(f"Created {filename} with {len(output_df)} records")
 
@@ -158,19 +210,28 @@ class ETTJPipeline:
             self.logger.info('No parameters to save')
             return
         filepath=os.path.join(self.output_dir,'ettj_parameters.csv')
-        params_df=params_df.copy()
-        params_df['date']=params_df['date'].astype(str)
-        if os.path.exists(filepath):
-            existing=pd.read_csv(filepath)
-            combined=pd.concat([existing, params_df], ignore_index=True)
-            combined=combined.drop_duplicates(subset=['date','grupo_indexador'], keep='last')
-            combined=combined.sort_values(['date','grupo_indexador']).reset_index(drop=True)
+        params_df=params_df.assign(date=_iso_dates(params_df['date']))
+        keys=['date','grupo_indexador']
+        try:
+            last_date=_last_csv_date(filepath)
+            file_exists=True
+        except FileNotFoundError:
+            last_date, file_exists=None, False
+        if last_date is not None and params_df['date'].min() > last_date:
+            params_df=_dedupe_sorted(params_df, keys)
+            params_df.to_csv(filepath, mode='a', header=False, index=False)
+            self.logger.info(f"Appended {len(params_df)} new records to ettj_parameters.csv")
+        elif file_exists:
+            existing=pd.read_csv(filepath, dtype=_PARAMETER_DTYPES)
+            combined=_dedupe_sorted(pd.concat([existing, params_df], ignore_index=True), keys)
             combined.to_csv(filepath, index=False)
             self.logger.info(f"Updated ettj_parameters.csv with {len(params_df)} new records")
         else:
-            params_df=params_df.sort_values(['date','grupo_indexador']).reset_index(drop=True)
+            params_df=_dedupe_sorted(params_df, keys)
             params_df.to_csv(filepath, index=False)
             self.logger.info(f"Created ettj_parameters.csv with {len(params_df)} records")
+
+
 def main():
     """Main entry point."""
     logger.info("Starting ANBIMA ETTJ pipeline")
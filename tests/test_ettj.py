@@ -5,13 +5,52 @@ Tests for ANBIMA ETTJ data fetcher.
 import unittest
 import sys
 import os
+import json
 from datetime import date
-from unittest.mock import patch, MagicMock, call
+from unittest.mock import patch
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from data_fetcher import AnbimaETTJFetcher, fetch_anbima_ettj_api
+from data_fetcher import (
+    AnbimaETTJFetcher, fetch_anbima_ettj_api, fetch_anbima_ettj_api_range, clear_response_cache
+)
+
+
+class _FakeResponse:
+    """Minimal stand-in for a urllib3 response returned by the shared pool."""
+    
+    def __init__(self, status, data=b'', headers=None):
+        self.status = status
+        self.data = data
+        self.headers = headers or {}
+
+
+def _curve_body(ref_date=None):
+    """Return a one-vertex ETTJ response body, dated ``ref_date`` when given."""
+    payload = {'curvas': [{'vertice_du': 21, 'taxa_prefixadas': 11.5}]}
+    if ref_date:
+        payload = {'data_referencia': ref_date, **payload}
+    return json.dumps(payload).encode()
+
+
+def authenticated_pool(test):
+    """
+    Run ``test`` against a mocked connection pool with a fixed token.
+    
+    The test receives ``(mock_token, mock_http)``, and ``ANBIMA_CLIENT_ID``
+    is set for its duration.
+    """
+    test = patch.dict(os.environ, {'ANBIMA_CLIENT_ID': 'test-client-id-456'})(test)
+    test = patch('data_fetcher.get_access_token', return_value='test-token-789')(test)
+    return patch('data_fetcher._HTTP')(test)
+
+
+# Tests that hit the live ANBIMA API only run when explicitly requested
+network_test = unittest.skipUnless(
+    os.environ.get('RUN_NETWORK_TESTS') == '1',
+    'network tests disabled; set RUN_NETWORK_TESTS=1 to run them'
+)
 
 
 class TestAnbimaETTJFetcher(unittest.TestCase):
@@ -20,7 +59,22 @@ class TestAnbimaETTJFetcher(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures."""
         self.fetcher = AnbimaETTJFetcher()
+        clear_response_cache()
+        
+        # Range prefetching calls the network directly rather than through
+        # fetch_anbima_ettj_api, so keep it offline unless a test re-patches it,
+        # and do not let one test's outcome disable it for the rest of the run
+        self.mock_range = self._start_patch(
+            patch('data_fetcher.fetch_anbima_ettj_api_range', return_value=None)
+        )
+        self._start_patch(patch('data_fetcher._range_query_supported', True))
+    
+    def _start_patch(self, patcher):
+        """Start ``patcher`` for the duration of the current test."""
+        self.addCleanup(patcher.stop)
+        return patcher.start()
     
+    @network_test
     def test_fetch_ettj_for_date_structure(self):
         """Test that fetch_ettj_for_date returns proper structure."""
         # This will likely return empty list due to network restrictions
@@ -41,16 +95,17 @@ class TestAnbimaETTJFetcher(unittest.TestCase):
                     'nominal' in vertex or 'real' in vertex or 'breakeven' in vertex
                 )
     
+    @network_test
     def test_fetch_ettj_helper_function(self):
         """Test the fetch_anbima_ettj_api helper function."""
-        from urllib.error import URLError
+        from urllib3.exceptions import HTTPError
         
         # Test without date parameter (may fail due to network restrictions)
         try:
             result = fetch_anbima_ettj_api()
             # If successful, should return dict or None
             self.assertTrue(result is None or isinstance(result, dict))
-        except (URLError, Exception):
+        except HTTPError:
             # Network errors are expected and acceptable
             pass
         
@@ -58,10 +113,11 @@ class TestAnbimaETTJFetcher(unittest.TestCase):
         try:
             result = fetch_anbima_ettj_api("2024-11-14")
             self.assertTrue(result is None or isinstance(result, dict))
-        except (URLError, Exception):
+        except HTTPError:
             # Network errors are expected and acceptable
             pass
     
+    @network_test
     def test_week_data_structure(self):
         """Test that fetch_week_data returns proper structure."""
         start = date(2024, 11, 11)  # Monday
@@ -144,6 +200,118 @@ class TestAnbimaETTJFetcher(unittest.TestCase):
         self.assertIsNone(result[0]['real'])
         self.assertIsNone(result[0]['breakeven'])
     
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_fetch_with_alternative_field_names(self, mock_api):
+        """Test fetcher with alias field names and a row using a different scheme."""
+        mock_api.return_value = {
+            'curvas': [
+                {'du': 21, 'taxa_nominal': 11.5, 'taxa_real': 6.2},
+                {'prazo_du': 42, 'taxa_pre': 11.8, 'taxa_breakeven': 5.1}
+            ]
+        }
+        
+        result = self.fetcher.fetch_ettj_for_date(date(2024, 11, 14))
+        
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0]['du'], 21)
+        self.assertEqual(result[0]['nominal'], 11.5)
+        self.assertEqual(result[0]['real'], 6.2)
+        self.assertIsNone(result[0]['breakeven'])
+        self.assertEqual(result[1]['du'], 42)
+        self.assertEqual(result[1]['nominal'], 11.8)
+        self.assertEqual(result[1]['breakeven'], 5.1)
+    
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_fetch_keeps_zero_rates(self, mock_api):
+        """Test that a 0.0 rate is kept rather than treated as missing."""
+        mock_api.return_value = {
+            'curvas': [
+                {'vertice_du': 21, 'taxa_prefixadas': 11.5, 'taxa_implicita': 0.0},
+                # Row with a different naming scheme goes through the alias lookup
+                {'du': 42, 'taxa_nominal': 0.0, 'taxa_breakeven': 0.0}
+            ]
+        }
+        
+        result = self.fetcher.fetch_ettj_for_date(date(2024, 11, 14))
+        
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0]['breakeven'], 0.0)
+        self.assertEqual(result[1]['du'], 42)
+        self.assertEqual(result[1]['nominal'], 0.0)
+        self.assertEqual(result[1]['breakeven'], 0.0)
+
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_fetch_keeps_rates_missing_from_first_vertex(self, mock_api):
+        """Test that rates absent from the first vertex are still read from later ones."""
+        mock_api.return_value = {
+            'ettj': [
+                {'vertice_du': 1, 'taxa_prefixadas': 10.5},
+                {'vertice_du': 21, 'taxa_prefixadas': 10.6, 'taxa_ipca': 6.1, 'taxa_implicita': 4.3}
+            ]
+        }
+
+        result = self.fetcher.fetch_ettj_for_date(date(2024, 11, 14))
+
+        self.assertEqual(len(result), 2)
+        self.assertIsNone(result[0]['real'])
+        self.assertEqual(result[1]['real'], 6.1)
+        self.assertEqual(result[1]['breakeven'], 4.3)
+
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_fetch_falls_back_to_alias_for_null_rate(self, mock_api):
+        """Test that a null rate under the resolved name falls back to its aliases."""
+        mock_api.return_value = {
+            'curvas': [
+                {'vertice_du': 21, 'taxa_prefixadas': 11.5},
+                {'vertice_du': 42, 'taxa_prefixadas': None, 'taxa_nominal': 10.5}
+            ]
+        }
+
+        result = self.fetcher.fetch_ettj_for_date(date(2024, 11, 14))
+
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[1]['nominal'], 10.5)
+
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_parsed_historical_date_is_memoized(self, mock_api):
+        """Test that a past date is parsed once per fetcher."""
+        mock_api.return_value = {'curvas': [{'vertice_du': 21, 'taxa_prefixadas': 11.5}]}
+
+        first = self.fetcher.fetch_ettj_for_date(date(2024, 11, 14))
+        first[0]['nominal'] = 999
+        first.clear()
+        second = self.fetcher.fetch_ettj_for_date(date(2024, 11, 14))
+
+        self.assertEqual(mock_api.call_count, 1)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(second[0]['nominal'], 11.5)
+
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_stand_in_curve_is_not_memoized(self, mock_api):
+        """Test that a curve for another date is not memoized under the requested date."""
+        mock_api.return_value = {
+            'data_referencia': '2024-11-13',
+            'curvas': [{'vertice_du': 21, 'taxa_prefixadas': 11.5}]
+        }
+
+        self.fetcher.fetch_ettj_for_date(date(2024, 11, 14))
+        self.fetcher.fetch_ettj_for_date(date(2024, 11, 14))
+
+        self.assertEqual(mock_api.call_count, 2)
+
+    @patch('data_fetcher.RESPONSE_CACHE_SIZE', 2)
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_parsed_date_memo_is_bounded(self, mock_api):
+        """Test that the parsed-vertex memo evicts its least recently used date."""
+        mock_api.return_value = {'curvas': [{'vertice_du': 21, 'taxa_prefixadas': 11.5}]}
+
+        for day in (4, 5, 4, 6):
+            self.fetcher.fetch_ettj_for_date(date(2024, 11, day))
+
+        self.assertEqual(
+            list(self.fetcher._date_cache), [date(2024, 11, 4), date(2024, 11, 6)]
+        )
+
     @patch('data_fetcher.fetch_anbima_ettj_api')
     def test_fetch_extracts_date_from_response(self, mock_api):
         """Test that fetcher extracts the actual date from API response."""
@@ -242,16 +410,17 @@ class TestAnbimaETTJFetcher(unittest.TestCase):
             ]
         }
         
-        # Fetch data for a week (will make 5 API calls)
+        # Fetch data for a week (will make 4 API calls; Friday 2024-11-15 is
+        # a national holiday and is skipped)
         result = self.fetcher.fetch_week_data(
             date(2024, 11, 11),  # Monday
             date(2024, 11, 15)   # Friday
         )
         
-        # Should have 5 vertices (one for each weekday call)
+        # Should have 4 vertices (one for each business day call)
         # Before the fix, these would have different dates but same data
         # After the fix, they should all have the same date
-        self.assertEqual(len(result), 5)
+        self.assertEqual(len(result), 4)
         
         # All vertices should have the same date from the API response
         for vertex in result:
@@ -261,81 +430,374 @@ class TestAnbimaETTJFetcher(unittest.TestCase):
         for vertex in result:
             self.assertEqual(vertex['du'], 21)
     
-    @patch('data_fetcher.urlopen')
-    @patch('data_fetcher.Request')
-    def test_authentication_headers_added(self, mock_request_class, mock_urlopen):
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_week_data_preserves_date_order(self, mock_api):
+        """Test that concurrent week fetches are returned in date order."""
+        # Echo the requested date back so each call yields a distinct vertex
+        mock_api.side_effect = lambda date_str: {
+            'data_referencia': date_str,
+            'curvas': [{'vertice_du': 21, 'taxa_prefixadas': 11.5}]
+        }
+        
+        result = self.fetcher.fetch_week_data(
+            date(2024, 11, 4),   # Monday
+            date(2024, 11, 10)   # Sunday
+        )
+        
+        # Weekend dates are never requested
+        self.assertEqual(mock_api.call_count, 5)
+        self.assertEqual(
+            [vertex['date'] for vertex in result],
+            [date(2024, 11, d) for d in range(4, 9)]
+        )
+    
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_week_data_skips_brazilian_holidays(self, mock_api):
+        """Test that national holidays are not requested."""
+        mock_api.return_value = None
+        
+        # 2024-11-15 (Proclamação da República) and 2024-11-20
+        # (Consciência Negra) fall on weekdays
+        self.fetcher.fetch_week_data(date(2024, 11, 11), date(2024, 11, 22))
+        
+        requested = sorted(c.args[0] for c in mock_api.call_args_list)
+        self.assertEqual(requested, [
+            '2024-11-11', '2024-11-12', '2024-11-13', '2024-11-14',
+            '2024-11-18', '2024-11-19', '2024-11-21', '2024-11-22',
+        ])
+    
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_week_frame_is_columnar(self, mock_api):
+        """Test that fetch_week_frame returns typed columns."""
+        mock_api.return_value = {
+            'data_referencia': '2024-11-04',
+            'curvas': [
+                {'vertice_du': 21, 'taxa_prefixadas': 11.5, 'taxa_ipca': 6.2},
+                {'vertice_du': 42, 'taxa_prefixadas': 11.8}
+            ]
+        }
+        
+        frame = self.fetcher.fetch_week_frame(date(2024, 11, 4), date(2024, 11, 4))
+        
+        self.assertEqual(list(frame.columns), ['date', 'du', 'nominal', 'real', 'breakeven'])
+        self.assertEqual(frame['du'].dtype, 'int32')
+        self.assertEqual(frame['real'].dtype, 'float64')
+        self.assertEqual(frame['du'].tolist(), [21, 42])
+        self.assertTrue(frame['real'].isna().iloc[1])
+        self.assertTrue(frame['breakeven'].isna().all())
+
+    @patch('data_fetcher.fetch_anbima_ettj_api')
+    def test_week_frame_coerces_non_numeric_values(self, mock_api):
+        """Test that one malformed vertex does not fail the whole frame."""
+        mock_api.return_value = {
+            'data_referencia': '2024-11-04',
+            'curvas': [
+                {'vertice_du': 21, 'taxa_prefixadas': '11,5', 'taxa_ipca': 6.2},
+                {'vertice_du': 'n/a', 'taxa_prefixadas': 11.8},
+                {'vertice_du': 42, 'taxa_prefixadas': 11.9}
+            ]
+        }
+
+        frame = self.fetcher.fetch_week_frame(date(2024, 11, 4), date(2024, 11, 4))
+
+        self.assertEqual(frame['du'].tolist(), [21, 42])
+        self.assertTrue(frame['nominal'].isna().iloc[0])
+        self.assertEqual(frame['real'].iloc[0], 6.2)
+        self.assertEqual(frame['nominal'].iloc[1], 11.9)
+
+    @authenticated_pool
+    def test_authentication_headers_added(self, mock_token, mock_http):
         """Test that authentication headers are added when env vars are set."""
-        # Set environment variables
-        os.environ['ANBIMA_API_KEY'] = 'test-api-key-123'
-        os.environ['ANBIMA_CLIENT_ID'] = 'test-client-id-456'
+        # Mock the pooled response
+        mock_response = _FakeResponse(200, b'{"curvas": []}')
+        mock_http.request.return_value = mock_response
+        
+        # Call the API function
+        fetch_anbima_ettj_api("2024-11-14")
+        
+        # Verify headers were sent on the pooled request
+        headers = mock_http.request.call_args.kwargs['headers']
+        
+        # Check for User-Agent header
+        self.assertEqual(headers['User-Agent'], 'AnbimaETTJ-Replication')
+        self.assertEqual(headers['Accept-Encoding'], 'gzip, deflate')
+        
+        # Check for authentication headers
+        self.assertEqual(headers['Authorization'], 'Bearer test-token-789')
+        self.assertEqual(headers['client_id'], 'test-client-id-456')
+    
+    @patch('data_fetcher.LATEST_CACHE_TTL', 0)
+    @authenticated_pool
+    def test_historical_response_is_cached(self, mock_token, mock_http):
+        """Test that a past date is only requested once per process."""
+        mock_response = _FakeResponse(200, _curve_body('2024-11-14'))
+        mock_http.request.return_value = mock_response
+        
+        first = fetch_anbima_ettj_api("2024-11-14")
+        second = fetch_anbima_ettj_api("2024-11-14")
+        
+        self.assertEqual(first, second)
+        self.assertEqual(mock_http.request.call_count, 1)
+    
+    @authenticated_pool
+    def test_historical_response_is_cached_on_disk(self, mock_token, mock_http):
+        """Test that ANBIMA_CACHE_DIR serves past dates across processes."""
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.dict(os.environ, {'ANBIMA_CACHE_DIR': tmp}):
+                mock_response = _FakeResponse(200, _curve_body('2024-11-14'))
+                mock_http.request.return_value = mock_response
+                
+                first = fetch_anbima_ettj_api("2024-11-14")
+                # Simulate a new process: the in-memory cache is empty
+                clear_response_cache()
+                second = fetch_anbima_ettj_api("2024-11-14")
+                
+                self.assertEqual(first, second)
+                self.assertEqual(mock_http.request.call_count, 1)
+                self.assertEqual(os.listdir(tmp), ['2024-11-14.json'])
+    
+    def test_disk_cache_entry_is_compact_json(self):
+        """Test that a disk cache entry is written as compact JSON with no temp file left."""
+        import tempfile
+        from data_fetcher import _disk_cache_store
+        
+        payload = json.loads(_curve_body('2024-11-14'))
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.dict(os.environ, {'ANBIMA_CACHE_DIR': tmp}):
+                _disk_cache_store('2024-11-14', payload)
+                
+                self.assertEqual(os.listdir(tmp), ['2024-11-14.json'])
+                with open(os.path.join(tmp, '2024-11-14.json'), 'rb') as f:
+                    raw = f.read()
+                self.assertEqual(json.loads(raw), payload)
+                self.assertNotIn(b' ', raw)
+    
+    def test_failed_disk_cache_write_leaves_no_files(self):
+        """Test that a write failing at the rename leaves neither a partial entry nor a temp file."""
+        import tempfile
+        from data_fetcher import _disk_cache_store
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.dict(os.environ, {'ANBIMA_CACHE_DIR': tmp}), \
+                    patch('data_fetcher.os.replace', side_effect=OSError('disk full')):
+                _disk_cache_store('2024-11-14', json.loads(_curve_body('2024-11-14')))
+                
+                self.assertEqual(os.listdir(tmp), [])
+    
+    @authenticated_pool
+    def test_response_for_another_date_is_not_cached_on_disk(self, mock_token, mock_http):
+        """Test that a fallback curve for an earlier date is not persisted under the requested date."""
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.dict(os.environ, {'ANBIMA_CACHE_DIR': tmp}):
+                mock_http.request.return_value = _FakeResponse(200, _curve_body('2024-11-13'))
+                
+                fetch_anbima_ettj_api("2024-11-14")
+                
+                self.assertEqual(os.listdir(tmp), [])
+    
+    @patch('data_fetcher.LATEST_CACHE_TTL', 0)
+    @authenticated_pool
+    def test_response_for_another_date_expires_in_memory(self, mock_token, mock_http):
+        """Test that a stand-in curve for an earlier date is refetched once it expires."""
+        mock_http.request.side_effect = [
+            _FakeResponse(200, _curve_body('2024-11-13')),
+            _FakeResponse(200, _curve_body('2024-11-14')),
+        ]
+        
+        fetch_anbima_ettj_api("2024-11-14")
+        second = fetch_anbima_ettj_api("2024-11-14")
+        
+        self.assertEqual(mock_http.request.call_count, 2)
+        self.assertEqual(second['data_referencia'], '2024-11-14')
+    
+    @patch('data_fetcher.time.sleep')
+    @patch('data_fetcher.MAX_REQUESTS_PER_SECOND', 10)
+    @patch('data_fetcher._next_request_at', 0.0)
+    def test_requests_are_rate_limited(self, mock_sleep):
+        """Test that back-to-back requests are spaced by the rate limit."""
+        from data_fetcher import _throttle
+
+        for _ in range(3):
+            _throttle()
+
+        waits = [c.args[0] for c in mock_sleep.call_args_list]
+        self.assertEqual(len(waits), 2)
+        self.assertAlmostEqual(waits[0], 0.1, delta=0.05)
+        self.assertAlmostEqual(waits[1], 0.2, delta=0.05)
+
+    @authenticated_pool
+    def test_empty_body_returns_none(self, mock_token, mock_http):
+        """Test that an empty 200 response is treated as no data."""
+        mock_response = _FakeResponse(200, b'')
+        mock_http.request.return_value = mock_response
+
+        self.assertIsNone(fetch_anbima_ettj_api("2024-11-14"))
+    
+    @authenticated_pool
+    def test_disk_cache_can_be_disabled(self, mock_token, mock_http):
+        """Test that ANBIMA_CACHE_DISABLE=1 skips the disk cache."""
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.dict(os.environ, {
+                'ANBIMA_CACHE_DIR': tmp,
+                'ANBIMA_CACHE_DISABLE': '1'
+            }):
+                mock_response = _FakeResponse(200, _curve_body('2024-11-14'))
+                mock_http.request.return_value = mock_response
+                
+                fetch_anbima_ettj_api("2024-11-14")
+                
+                self.assertEqual(os.listdir(tmp), [])
+    
+    @patch('data_fetcher.LATEST_CACHE_TTL', 0)
+    @authenticated_pool
+    def test_expired_latest_response_is_revalidated(self, mock_token, mock_http):
+        """Test that an expired latest curve is revalidated with its ETag."""
+        first_response = _FakeResponse(200, _curve_body(), headers={'ETag': '"abc"'})
+        not_modified = _FakeResponse(304)
+        mock_http.request.side_effect = [first_response, not_modified]
+        
+        first = fetch_anbima_ettj_api()
+        second = fetch_anbima_ettj_api()
+        
+        self.assertEqual(first, second)
+        headers = mock_http.request.call_args.kwargs['headers']
+        self.assertEqual(headers['If-None-Match'], '"abc"')
+    
+    @authenticated_pool
+    def test_range_prefetch_skips_dates_cached_on_disk(self, mock_token, mock_http):
+        """Test that dates already in ANBIMA_CACHE_DIR are not requested again as a range."""
+        import tempfile
+        from data_fetcher import _disk_cache_store
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.dict(os.environ, {'ANBIMA_CACHE_DIR': tmp}):
+                for ref_date in ('2024-11-04', '2024-11-05'):
+                    _disk_cache_store(ref_date, json.loads(_curve_body(ref_date)))
+                
+                result = self.fetcher.fetch_week_data(date(2024, 11, 4), date(2024, 11, 5))
+                
+                self.mock_range.assert_not_called()
+                mock_http.request.assert_not_called()
+                self.assertEqual(len(result), 2)
+    
+    @patch('data_fetcher.fetch_anbima_ettj_api_range', fetch_anbima_ettj_api_range)
+    @authenticated_pool
+    def test_failed_range_request_disables_range_queries(self, mock_token, mock_http):
+        """Test that a failed range request is not retried on later calls."""
+        import data_fetcher
+        
+        mock_http.request.return_value = _FakeResponse(503)
+        
+        self.assertIsNone(fetch_anbima_ettj_api_range('2024-11-04', '2024-11-05'))
+        self.assertIsNone(fetch_anbima_ettj_api_range('2024-11-04', '2024-11-05'))
+        
+        self.assertFalse(data_fetcher._range_query_supported)
+        self.assertEqual(mock_http.request.call_count, 1)
+    
+    @patch('data_fetcher.fetch_anbima_ettj_api_range', fetch_anbima_ettj_api_range)
+    @authenticated_pool
+    def test_week_data_uses_single_range_request(self, mock_token, mock_http):
+        """Test that a range response answers every covered date."""
+        mock_response = _FakeResponse(200, (
+            b'[{"data_referencia": "2024-11-04", "ettj": [{"vertice_du": 21, "taxa_prefixadas": 11.5}]},'
+            b' {"data_referencia": "2024-11-05", "ettj": [{"vertice_du": 21, "taxa_prefixadas": 11.6}]}]'
+        ))
+        mock_http.request.return_value = mock_response
+        
+        result = self.fetcher.fetch_week_data(date(2024, 11, 4), date(2024, 11, 5))
+        
+        self.assertEqual(mock_http.request.call_count, 1)
+        self.assertIn('data_inicio=2024-11-04', mock_http.request.call_args.args[1])
+        self.assertEqual([v['nominal'] for v in result], [11.5, 11.6])
+    
+    @patch('data_fetcher._token_refresher')
+    @patch('data_fetcher._HTTP')
+    @patch.dict(os.environ, {
+        'ANBIMA_CLIENT_ID': 'test-client-id-456',
+        'ANBIMA_CLIENT_SECRET': 'test-client-secret'
+    })
+    def test_concurrent_token_requests_share_one_refresh(self, mock_http, mock_refresher):
+        """Test that simultaneous callers trigger a single token POST."""
+        import threading
+        import data_fetcher
+        
+        data_fetcher._access_token = None
+        data_fetcher._token_expiry = None
         
         try:
-            # Mock the request object
-            mock_request = MagicMock()
-            mock_request_class.return_value = mock_request
+            mock_response = _FakeResponse(200, b'{"access_token": "tok", "expires_in": 3600}')
+            mock_http.request.return_value = mock_response
             
-            # Mock the response
-            mock_response = MagicMock()
-            mock_response.status = 200
-            mock_response.read.return_value = b'{"curvas": []}'
-            mock_response.__enter__ = MagicMock(return_value=mock_response)
-            mock_response.__exit__ = MagicMock(return_value=False)
-            mock_urlopen.return_value = mock_response
+            tokens = []
+            threads = [
+                threading.Thread(target=lambda: tokens.append(data_fetcher.get_access_token()))
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
             
-            # Call the API function
-            fetch_anbima_ettj_api("2024-11-14")
+            self.assertEqual(tokens, ['tok'] * 5)
+            self.assertEqual(mock_http.request.call_count, 1)
+            # The background refresher is stubbed so no thread outlives the test
+            mock_refresher.ensure_running.assert_called()
             
-            # Verify headers were added
-            header_calls = [call[0] for call in mock_request.add_header.call_args_list]
+        finally:
+            data_fetcher._access_token = None
+            data_fetcher._token_expiry = None
+    
+    @patch('data_fetcher._MIN_REFRESH_DELAY', 0)
+    @patch('data_fetcher._HTTP')
+    @patch.dict(os.environ, {
+        'ANBIMA_CLIENT_ID': 'test-client-id-456',
+        'ANBIMA_CLIENT_SECRET': 'test-client-secret'
+    })
+    def test_background_refresher_renews_expiring_token(self, mock_http):
+        """Test that the refresher replaces a token about to expire."""
+        import time
+        import data_fetcher
+        
+        data_fetcher._access_token = 'old-token'
+        data_fetcher._token_expiry = data_fetcher.datetime.now()
+        refresher = data_fetcher._TokenRefresher()
+        
+        try:
+            mock_response = _FakeResponse(200, b'{"access_token": "new-token", "expires_in": 3600}')
+            mock_http.request.return_value = mock_response
             
-            # Check for User-Agent header
-            self.assertIn(('User-Agent', 'Python-urllib/AnbimaETTJ-Replication'), header_calls)
+            refresher.ensure_running()
+            deadline = time.monotonic() + 2
+            while data_fetcher._access_token != 'new-token' and time.monotonic() < deadline:
+                time.sleep(0.01)
             
-            # Check for authentication headers
-            self.assertIn(('X-API-Key', 'test-api-key-123'), header_calls)
-            self.assertIn(('client_id', 'test-client-id-456'), header_calls)
+            self.assertEqual(data_fetcher._access_token, 'new-token')
             
         finally:
-            # Clean up environment variables
-            if 'ANBIMA_API_KEY' in os.environ:
-                del os.environ['ANBIMA_API_KEY']
-            if 'ANBIMA_CLIENT_ID' in os.environ:
-                del os.environ['ANBIMA_CLIENT_ID']
-    
-    @patch('data_fetcher.urlopen')
-    @patch('data_fetcher.Request')
-    def test_no_authentication_headers_without_env_vars(self, mock_request_class, mock_urlopen):
-        """Test that authentication headers are NOT added when env vars are not set."""
-        # Ensure environment variables are not set
-        if 'ANBIMA_API_KEY' in os.environ:
-            del os.environ['ANBIMA_API_KEY']
-        if 'ANBIMA_CLIENT_ID' in os.environ:
-            del os.environ['ANBIMA_CLIENT_ID']
-        
-        # Mock the request object
-        mock_request = MagicMock()
-        mock_request_class.return_value = mock_request
-        
-        # Mock the response
-        mock_response = MagicMock()
-        mock_response.status = 200
-        mock_response.read.return_value = b'{"curvas": []}'
-        mock_response.__enter__ = MagicMock(return_value=mock_response)
-        mock_response.__exit__ = MagicMock(return_value=False)
-        mock_urlopen.return_value = mock_response
+            refresher.stop()
+            data_fetcher._access_token = None
+            data_fetcher._token_expiry = None
+    
+    @patch('data_fetcher._HTTP')
+    @patch.dict(os.environ)
+    def test_no_authentication_headers_without_env_vars(self, mock_http):
+        """Test that no request is sent when credentials are not set."""
+        # Ensure environment variables are not set; restored after the test
+        os.environ.pop('ANBIMA_CLIENT_ID', None)
+        os.environ.pop('ANBIMA_CLIENT_SECRET', None)
         
         # Call the API function
-        fetch_anbima_ettj_api("2024-11-14")
-        
-        # Verify headers were added
-        header_calls = [call[0] for call in mock_request.add_header.call_args_list]
+        result = fetch_anbima_ettj_api("2024-11-14")
         
-        # Check for User-Agent header (should be present)
-        self.assertIn(('User-Agent', 'Python-urllib/AnbimaETTJ-Replication'), header_calls)
-        
-        # Check that authentication headers were NOT added
-        auth_headers = [h for h in header_calls if h[0] in ('X-API-Key', 'client_id')]
-        self.assertEqual(len(auth_headers), 0)
+        # Without a token the API must not be called at all
+        self.assertIsNone(result)
+        mock_http.request.assert_not_called()
 
 
 class TestPipeline(unittest.TestCase):
@@ -374,6 +836,70 @@ class TestPipeline(unittest.TestCase):
         # Should be 4 days apart
         self.assertEqual((end - start).days, 4)
 
+    
+    def _vertices(self, day, rate):
+        """Build a one-vertex frame as returned by fetch_week_frame."""
+        import pandas as pd
+        return pd.DataFrame({
+            'date': [day], 'du': [21], 'nominal': [rate], 'real': [None], 'breakeven': [None]
+        })
+    
+    def test_save_appends_later_dates(self):
+        """Test that strictly later dates are appended to the existing file."""
+        import tempfile
+        import pandas as pd
+        from pipeline import ETTJPipeline
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            pipeline = ETTJPipeline(output_dir=tmp)
+            pipeline._save_to_csv(self._vertices(date(2024, 11, 4), 11.5))
+            pipeline._save_to_csv(self._vertices(date(2024, 11, 5), 11.6))
+            
+            saved = pd.read_csv(os.path.join(tmp, 'ettj_nominal.csv'))
+            self.assertEqual(saved['date'].tolist(), ['2024-11-04', '2024-11-05'])
+            self.assertEqual(saved['rate'].tolist(), [11.5, 11.6])
+            self.assertFalse(os.path.exists(os.path.join(tmp, 'ettj_real.csv')))
+    
+    def test_save_merges_overlapping_dates(self):
+        """Test that re-saved dates replace existing rows instead of duplicating them."""
+        import tempfile
+        import pandas as pd
+        from pipeline import ETTJPipeline
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            pipeline = ETTJPipeline(output_dir=tmp)
+            pipeline._save_to_csv(self._vertices(date(2024, 11, 5), 11.6))
+            pipeline._save_to_csv(self._vertices(date(2024, 11, 4), 11.5))
+            pipeline._save_to_csv(self._vertices(date(2024, 11, 5), 11.7))
+            
+            saved = pd.read_csv(os.path.join(tmp, 'ettj_nominal.csv'))
+            self.assertEqual(saved['date'].tolist(), ['2024-11-04', '2024-11-05'])
+            self.assertEqual(saved['rate'].tolist(), [11.5, 11.7])
+
+    def test_save_parameters_appends_and_merges(self):
+        """Test that parameter rows are appended for new dates and replaced for repeated ones."""
+        import tempfile
+        import pandas as pd
+        from pipeline import ETTJPipeline
+
+        def params(day, b1):
+            return pd.DataFrame({
+                'date': [day, day], 'grupo_indexador': ['PREFIXADOS', 'IPCA'],
+                'b1': [b1, b1], 'b2': [0.0, 0.0], 'b3': [0.0, 0.0], 'b4': [0.0, 0.0],
+                'l1': [1.0, 1.0], 'l2': [0.5, 0.5]
+            })
+
+        with tempfile.TemporaryDirectory() as tmp:
+            pipeline = ETTJPipeline(output_dir=tmp)
+            pipeline._save_parameters_to_csv(params(date(2024, 11, 4), 0.1))
+            pipeline._save_parameters_to_csv(params(date(2024, 11, 5), 0.2))
+            pipeline._save_parameters_to_csv(params(date(2024, 11, 4), 0.3))
+
+            saved = pd.read_csv(os.path.join(tmp, 'ettj_parameters.csv'))
+            self.assertEqual(saved['date'].tolist(), ['2024-11-04'] * 2 + ['2024-11-05'] * 2)
+            self.assertEqual(saved['grupo_indexador'].tolist(), ['IPCA', 'PREFIXADOS'] * 2)
+            self.assertEqual(saved['b1'].tolist(), [0.3, 0.3, 0.2, 0.2])
+
 
 if __name__ == '__main__':
     unittest.main()